@@ -1,87 +1,191 @@
 # Goal is to annotate a vertex cover with dictionary representing various cluster metrics
 from igraph import Cover, VertexCover
-from scipy import nansum, nanmax
-from scipy.sparse import dok_matrix
-import uuid
-import collections
+from scipy.sparse import coo_matrix, csc_matrix, csr_matrix
+import itertools
 import time
 from circulo.metrics.omega import omega_index
 from circulo.utils.general import aggregate
 import circulo.metrics.graph
 import numpy as np
 
-def __get_weight_attr(G, metric_name, weights):
+#numba is optional, it only speeds up the sparse column scans below
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+def __get_weights(G, weights):
     '''
     :G graph
-    :metric_name the name of the metric calling this function
-    :weights
-
-    return (weight_attr, remove) where weight_attr is the weight attribute name, and "remove" is a boolean
-        as to wether to get rid of the weight attribute. This happens if we create the weight attribute for
-        the purpose of the metric
+    :weights None, the name of an edge attribute, or a list (or array) with one weight per edge
 
+    return an array of edge weights indexed by edge id, or None if the graph is unweighted. List weights are kept
+        local rather than attached to the graph as a temporary edge attribute
     '''
 
     #if the weights parameter is a string then the graph utilizes weights
     if isinstance(weights, str):
-      return (weights, False)
-    #if the weights is being used for something else, then we
+      return np.asarray(G.es[weights], dtype=float)
     elif weights is not None:
-      attr_name = uuid.uuid5(uuid.NAMESPACE_DNS, '{}.circulo.lab41'.format(metric_name))
-      G.es[attr_name] = weights
-      return (attr_name, True)
-    return (None, False)
+      return np.asarray(weights, dtype=float)
+    return None
+
+def __membership_sets(cover):
+    '''
+    Returns the communities of each vertex as frozensets, reusing the ones cached by compute_metrics if present
+    '''
+    cache = getattr(cover, '_metric_cache', None)
+    if cache is not None:
+        return cache['membership_sets']
+    return [frozenset(vertex_communities) for vertex_communities in cover.membership]
+
+def __crossing(cover):
+    '''
+    Returns cover.crossing(), reusing the result cached by compute_metrics if present
+    '''
+    cache = getattr(cover, '_metric_cache', None)
+    if cache is not None:
+        return cache['crossing']
+    return cover.crossing()
 
-def __remove_weight_attr(G, attr_name, remove):
-    if remove:
-      del G.es[uid]
+def __weighted_sum(external_edges, w_arr):
+  if w_arr is None:
+    return len(external_edges)
+  return float(w_arr[np.fromiter((e.index for e in external_edges), dtype=np.intp, count=len(external_edges))].sum())
 
-def __weighted_sum(external_edges, w_attr):
-  return len(external_edges) if w_attr is None else sum([ e[w_attr] for e in external_edges ])
+def __incidence_matrix(cover):
+    '''
+    Returns the community to vertex incidence matrix (rows = community, cols = vertex) of the cover, reusing the one
+    cached by compute_metrics if present. The vertices of community i are indices[indptr[i]:indptr[i+1]]
+    '''
+    cache = getattr(cover, '_metric_cache', None)
+    if cache is not None:
+        return cache['incidence']
+
+    indptr = np.cumsum([0] + [len(community) for community in cover])
+    indices = np.fromiter(itertools.chain.from_iterable(cover), dtype=np.int64, count=indptr[-1])
+    return csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(cover), cover.graph.vcount()))
+
+def __adjacency_matrix(G, w_arr):
+    '''
+    Returns the symmetric (weighted) adjacency matrix of G, parallel edges are summed and loops counted twice
+    '''
+    edges = np.array(G.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    edge_weights = np.ones(len(edges)) if w_arr is None else w_arr
+    A = coo_matrix((edge_weights, (edges[:,0], edges[:,1])), shape=(G.vcount(), G.vcount()))
+    return (A + A.T).tocsr()
 
-def fomd(cover, weights=None):
+def __internal_strengths(cover, w_arr):
+    '''
+    Returns a sparse matrix (rows = vertex, cols = community) of each vertex's (weighted) degree within the community,
+    i.e. its strength in cover.subgraph(i), without building the subgraphs.
+    '''
+    #the strength of every vertex towards each community, masked to the vertices in the community
+    M = __incidence_matrix(cover).T.tocsr()
+    return (__adjacency_matrix(cover.graph, w_arr) * M).multiply(M).tocsc()
+
+def __internal_edge_sums(int_strengths):
+    '''
+    Returns the (weighted) number of internal edges of each community from its internal strengths, every internal
+    edge contributes to the strength of both its endpoints
+    '''
+    return (np.asarray(int_strengths.sum(axis=0)).ravel()/2.0).tolist()
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def __count_above_kernel(data, indptr, threshold):
+        n_cols = len(indptr) - 1
+        rv = np.empty(n_cols, np.int64)
+        for i in prange(n_cols):
+            count = 0
+            for k in range(indptr[i], indptr[i+1]):
+                if data[k] > threshold:
+                    count += 1
+            rv[i] = count
+        return rv
+
+    @njit(parallel=True, cache=True)
+    def __odf_reductions_kernel(data, indptr, n_rows, threshold):
+        n_cols = len(indptr) - 1
+        maxs = np.empty(n_cols)
+        sums = np.empty(n_cols)
+        counts = np.empty(n_cols, np.int64)
+        for i in prange(n_cols):
+            #columns with unstored entries hold implicit zeros
+            col_max = 0.0 if indptr[i+1] - indptr[i] < n_rows else -np.inf
+            col_sum = 0.0
+            count = 0
+            for k in range(indptr[i], indptr[i+1]):
+                if data[k] > col_max:
+                    col_max = data[k]
+                col_sum += data[k]
+                if data[k] > threshold:
+                    count += 1
+            maxs[i] = col_max
+            sums[i] = col_sum
+            counts[i] = count
+        return maxs, sums, counts
+
+def __count_above(csc, threshold):
+    '''
+    Returns the number of stored entries greater than threshold in each column of a CSC matrix
+    '''
+    if njit is not None:
+        return __count_above_kernel(csc.data, csc.indptr, threshold)
+
+    above = np.concatenate(([0], np.cumsum(csc.data > threshold)))
+    return np.diff(above[csc.indptr])
+
+def fomd(cover, weights=None, int_strengths=None):
     '''
     Fraction over median (weighted) degree is the number of nodes that have an internal (weighted) degree greater than the median (weighted) degree of
     all nodes in the graph.
+
+    Args:
+        int_strengths: optional precomputed (weighted) internal degree of each vertex in each community
     '''
-    w_attr, remove = __get_weight_attr(cover.graph, 'fomd', weights)
+    w_arr = __get_weights(cover.graph, weights)
 
-    import scipy
-    median = scipy.median(cover.graph.strength(weights=w_attr))
-    rv = []
-    for subgraph in cover.subgraphs():
-        rv += [sum(1.0 for v in subgraph.strength(weights=w_attr) if v > median)/subgraph.vcount()]
+    strength = np.fromiter(cover.graph.strength(weights=weights), dtype=np.float64, count=cover.graph.vcount())
+    median = np.median(strength)
+    #vertices without internal edges are not stored, they never exceed the (non-negative) median
+    if int_strengths is None:
+        int_strengths = __internal_strengths(cover, w_arr)
+    counts = __count_above(int_strengths, median)
+    rv = (counts/__community_sizes(cover)).tolist()
 
-    __remove_weight_attr(cover.graph, w_attr, remove)
     return rv
 
-def expansion(cover, weights=None):
+def expansion(cover, weights=None, ext_edges=None):
     '''
     Expansion is the ratio between the (weighted) number of external (boundary) edges in a cluster and the number of nodes in the cluster.
 
+    Args:
+        ext_edges: optional precomputed result of external_edges(cover)
+
     :return list of expansion values, one for each community
     '''
-    w_attr, remove = __get_weight_attr(cover.graph, 'expansion', weights)
+    w_arr = __get_weights(cover.graph, weights)
     rv = []
-    external_edges = cover.external_edges()
+    external_edges = cover.external_edges() if ext_edges is None else ext_edges
     for i in range(len(cover)):
         size_i = cover.size(i)
-        rv += [1.0*__weighted_sum(external_edges[i], w_attr)/size_i]
+        rv += [1.0*__weighted_sum(external_edges[i], w_arr)/size_i]
 
-    __remove_weight_attr(cover.graph, w_attr, remove)
     return rv
 
-def cut_ratio(cover, allow_nan=False):
+def cut_ratio(cover, allow_nan=False, ext_edges=None):
     '''
     Cut ratio is the ratio between the number of external (boundary) edges in a cluster and the cluster's maximum possible number of external edges
 
     Args:
         allow_nan:
+        ext_edges: optional precomputed result of external_edges(cover)
     '''
 
     mode = "nan" if allow_nan == True else 0
     rv = []
-    external_edges = cover.external_edges()
+    external_edges = cover.external_edges() if ext_edges is None else ext_edges
 
     size_g = cover.graph.vcount()
     for i in range(len(cover)):
@@ -90,63 +194,81 @@ def cut_ratio(cover, allow_nan=False):
         rv += [1.0*len(external_edges[i])/denominator if denominator > 0 else float(mode)]
     return rv
 
-def conductance(cover, weights=None, allow_nan=False):
+def conductance(cover, weights=None, allow_nan=False, int_edges_sums=None, ext_edges=None):
     '''
     Conductance is the ratio between the (weighted) number of external (boundary) edges in a cluster and the cluster's total (weighted) number of edges
+
+    Args:
+        int_edges_sums: optional precomputed (weighted) internal edge count of each community
+        ext_edges: optional precomputed result of external_edges(cover)
     '''
-    w_attr, remove = __get_weight_attr(cover.graph, 'conductance', weights)
+    w_arr = __get_weights(cover.graph, weights)
 
     mode = "nan" if allow_nan else 0
     rv = []
-    external_edges = cover.external_edges()
+    external_edges = cover.external_edges() if ext_edges is None else ext_edges
+    if int_edges_sums is None:
+        int_edges_sums = __internal_edge_sums(__internal_strengths(cover, w_arr))
     for i in range(len(cover)):
-        int_edges_cnt = __weighted_sum(cover.subgraph(i).es(), w_attr)
-        ext_edges_cnt = __weighted_sum(external_edges[i], w_attr)
+        int_edges_cnt = int_edges_sums[i]
+        ext_edges_cnt = __weighted_sum(external_edges[i], w_arr)
         denominator = (2.0*int_edges_cnt+ext_edges_cnt)
 
         rv += [ext_edges_cnt/denominator if denominator > 0 else float(mode)]
 
 
-    __remove_weight_attr(cover.graph, w_attr, remove)
     return rv
 
-def separability(cover, weights=None, allow_nan = False):
+def separability(cover, weights=None, allow_nan = False, int_edges_sums=None, ext_edges=None):
     '''
     Separability is the ratio between the (weighted) number of internal edges in a cluster and its (weighted) number of external (boundary) edges.
+
+    Args:
+        int_edges_sums: optional precomputed (weighted) internal edge count of each community
+        ext_edges: optional precomputed result of external_edges(cover)
     '''
 
     mode = "nan" if allow_nan else 0
-    w_attr, remove = __get_weight_attr(cover.graph, 'separability', weights)
+    w_arr = __get_weights(cover.graph, weights)
     rv = []
-    external_edges = cover.external_edges()
+    external_edges = cover.external_edges() if ext_edges is None else ext_edges
+    if int_edges_sums is None:
+        int_edges_sums = __internal_edge_sums(__internal_strengths(cover, w_arr))
     for i in range(len(cover)):
-        int_edges_cnt = __weighted_sum(cover.subgraph(i).es(), w_attr)
-        ext_edges_cnt = __weighted_sum(external_edges[i], w_attr)
+        int_edges_cnt = int_edges_sums[i]
+        ext_edges_cnt = __weighted_sum(external_edges[i], w_arr)
         rv += [1.0*int_edges_cnt/ext_edges_cnt if ext_edges_cnt > 0 else float(mode)]
 
-    __remove_weight_attr(cover.graph, w_attr, remove)
     return rv
 
 
-def normalized_cut(cover, weights=None, allow_nan = False):
+def normalized_cut(cover, weights=None, allow_nan = False, int_edges_sums=None, ext_edges=None):
     '''
     Normalized cut is the sum of (weighted) conductance with the fraction of the (weighted) number of external edges over (weighted) number of all non-cluster edges
+
+    Args:
+        int_edges_sums: optional precomputed (weighted) internal edge count of each community
+        ext_edges: optional precomputed result of external_edges(cover)
     '''
-    w_attr, remove = __get_weight_attr(cover.graph, 'normalized_cut', weights)
+    w_arr = __get_weights(cover.graph, weights)
     mode = "nan" if allow_nan else 0
 
-    rv = cover.conductance(weights)
-    external_edges = cover.external_edges()
+    if int_edges_sums is None:
+        int_edges_sums = __internal_edge_sums(__internal_strengths(cover, w_arr))
+    external_edges = cover.external_edges() if ext_edges is None else ext_edges
+    rv = cover.conductance(weights, int_edges_sums=int_edges_sums, ext_edges=external_edges)
+    tot_edge_cnt = cover.graph.ecount() if w_arr is None else w_arr.sum()
     for i in range(len(cover)):
-        int_edges_cnt = __weighted_sum(cover.subgraph(i).es(), w_attr)
-        ext_edges_cnt = __weighted_sum(external_edges[i], w_attr)
-        tot_edge_cnt = __weighted_sum(cover.graph.es(), w_attr)
+        int_edges_cnt = int_edges_sums[i]
+        ext_edges_cnt = __weighted_sum(external_edges[i], w_arr)
         denominator = (2.0*(tot_edge_cnt - int_edges_cnt)+ext_edges_cnt)
         rv[i] += ext_edges_cnt/denominator if denominator > 0 else float(allow_nan)
 
-    __remove_weight_attr(cover.graph, w_attr, remove)
     return rv
 
+def __community_sizes(cover):
+    return np.diff(__incidence_matrix(cover).indptr).astype(float)
+
 def maximum_out_degree_fraction(cover, odf=None, weights=None):
     '''
     Out Degree Fraction (ODF) of a node in a cluster is the ratio between its number of external (boundary) edges
@@ -156,99 +278,107 @@ def maximum_out_degree_fraction(cover, odf=None, weights=None):
         odf = out_degree_fraction(cover, weights)
         odf = odf.tocsc()
 
-    rv = []
-    max_seen = odf.max(0).tocsc()
-    for i in range(len(cover)):
-        rv.append(max_seen[0,i])
-    return rv #[ nanmax(ratios) for ratios in odf ]
+    return odf.max(axis=0).toarray().ravel().tolist()
 
-def average_out_degree_fraction(cover, odf=None, weights=None):
+def average_out_degree_fraction(cover, odf=None, weights=None, sizes=None):
     '''
     Out Degree Fraction (ODF) of a node in a cluster is the ratio between its number of external (boundary) edges
     and its internal edges. Average ODF returns the average fraction for the cluster.
+
+    Args:
+        sizes: optional precomputed array of community sizes
     '''
-    rv = []
     if odf is None:
         odf = out_degree_fraction(cover, weights)
-        odf.tocsc()
+    if sizes is None:
+        sizes = __community_sizes(cover)
 
-    sums = odf.sum(0)
-    for i in range(len(cover)):
-      rv += [ sums[0,i]/cover.subgraph(i).vcount() ]
-    return rv
+    return (np.asarray(odf.sum(axis=0)).ravel()/sizes).tolist()
 
-def flake_out_degree_fraction(cover, odf=None, weights=None):
+def flake_out_degree_fraction(cover, odf=None, weights=None, sizes=None):
     '''
     Out Degree Fraction (ODF) of a node in a cluster is the ratio between its number of external (boundary) edges
     and its internal edges. Flake ODF returns the number of nodes for which this ratio is less than 1, i.e. a node has fewer internal edges than external ones.
+
+    Args:
+        sizes: optional precomputed array of community sizes
     '''
-    rv = []
     if odf is None:
         odf = out_degree_fraction(cover, weights)
-        odf = odf.tocsc()
+    odf = odf.tocsc()
+    if sizes is None:
+        sizes = __community_sizes(cover)
 
-    for i in range(len(cover)):
-        count = 0
-        # TODO: This functional can probably still be improved by using something that takes advantage of the sparsity
-        for item in odf[:,i]:
-            if item[0,0] > 1/2.0:
-                count += 1
-        rv += [count/cover.subgraph(i).vcount()]
-    return rv
+    counts = __count_above(odf, 1/2.0)
+    return (counts/sizes).tolist()
+
+def __odf_reductions(odf, sizes):
+    '''
+    Returns the (maximum, average, flake) ODF of each community, computed in a single sweep over the CSC matrix
+    '''
+    odf = odf.tocsc()
+    if njit is not None:
+        maxs, sums, counts = __odf_reductions_kernel(odf.data, odf.indptr, odf.shape[0], 1/2.0)
+    else:
+        maxs = odf.max(axis=0).toarray().ravel()
+        sums = np.asarray(odf.sum(axis=0)).ravel()
+        counts = __count_above(odf, 1/2.0)
 
-def out_degree_fraction(cover, weights=None, allow_nan = False):
+    return maxs.tolist(), (sums/sizes).tolist(), (counts/sizes).tolist()
+
+def out_degree_fraction(cover, weights=None, allow_nan = False, ext_edges=None):
     '''
     Out Degree Fraction (ODF) of a node in a cluster is the ratio between its number of external (boundary) edges
     and its internal edges.
+
+    Args:
+        ext_edges: optional precomputed result of external_edges(cover)
     '''
-    w_attr, remove = __get_weight_attr(cover.graph, 'out_degree_fraction', weights)
+    w_arr = __get_weights(cover.graph, weights)
     mode = "nan" if allow_nan else 0
 
     #do this outside the loop because it is computationally expensive
-    membership = cover.membership
-    external_edges = cover.external_edges()
-    degree_per_node = cover.graph.strength(weights=w_attr)
-    # Intialize return value
-    rv = dok_matrix((cover.graph.vcount(), len(cover))) # Rows = Vertex, cols = Cover
+    membership = __membership_sets(cover)
+    external_edges = cover.external_edges() if ext_edges is None else ext_edges
+    degree_per_node = np.array(cover.graph.strength(weights=weights), dtype=float)
+
+    inv_degree = np.full(degree_per_node.shape, float(mode))
+    np.divide(1.0, degree_per_node, out=inv_degree, where=degree_per_node != 0)
+
+    # Build the CSC arrays column by column (Rows = Vertex, cols = Cover): the boundary vertices of each community
+    # and their summed external edge weights, scaled by the inverse vertex strength
+    indptr = [0]
+    indices = [np.empty(0, dtype=np.int64)]
+    data = [np.empty(0)]
     for i in range(len(cover)):
-        ext_edge_per_node = dok_matrix((cover.graph.vcount(), 1))
+        num_edges = len(external_edges[i])
+        nodes = np.fromiter((edge.source if i in membership[edge.source] else edge.target for edge in external_edges[i]),
+                            dtype=np.int64, count=num_edges)
+        edge_weights = None if w_arr is None else w_arr[np.fromiter((edge.index for edge in external_edges[i]),
+                                                                     dtype=np.intp, count=num_edges)]
 
-        for edge in external_edges[i]:
-            node_index = edge.source if i in membership[edge.source] else edge.target
-            ext_edge_per_node[node_index, 0] += 1.0 if weights is None else edge[w_attr]
+        col_nodes, node_pos = np.unique(nodes, return_inverse=True)
+        indices.append(col_nodes)
+        data.append(np.bincount(node_pos, weights=edge_weights, minlength=len(col_nodes))*inv_degree[col_nodes])
+        indptr.append(indptr[-1] + len(col_nodes))
 
-        for (node, always_zero), ext_edges_for_this_node in ext_edge_per_node.items():
-            rv[node, i] += ext_edges_for_this_node/float(degree_per_node[node]) if degree_per_node[node] != 0 else float(mode)
+    rv = csc_matrix((np.concatenate(data), np.concatenate(indices), indptr), shape=(cover.graph.vcount(), len(cover)))
 
-    __remove_weight_attr(cover.graph, w_attr, remove)
     return rv
 
 
 def external_edges(cover):
     array_of_sets = [ [] for v in cover ]
 
-    # Go through membership array and find nodes in each community
-    community_sets = {}
-    membership_arrays = cover.membership
-    for vertex_id, vertex_communities in enumerate(membership_arrays):
-        for community in vertex_communities:
-            if community not in community_sets:
-                community_sets[community] = set()
-            community_sets[community].add(vertex_id)
-
-    # Move from dictionary of communities to array of communities
-    # TODO: Maybe we don't have to do this??
-    membership_sets = [community_sets[community] for community in sorted(community_sets.keys())]
+    # Communities of each vertex, as sets, so that an edge's boundary communities are a single symmetric difference
+    membership_sets = __membership_sets(cover)
 
-    for (edge, crossing) in zip(cover.graph.es, cover.crossing()):
+    for (edge, crossing) in zip(cover.graph.es, __crossing(cover)):
         if crossing:
             src,dst = edge.tuple
-            for i, membership_set in enumerate(membership_sets):
-                #print(i)
-                if src in membership_set and dst not in membership_set:
-                    array_of_sets[i].append(edge)
-                elif dst in membership_set and src not in membership_set:
-                    array_of_sets[i].append(edge)
+            #communities holding exactly one endpoint of the edge
+            for i in membership_sets[src] ^ membership_sets[dst]:
+                array_of_sets[i].append(edge)
 
     return array_of_sets
 
@@ -262,50 +392,71 @@ def compare_omega(cover, comparator):
 
 
 def compute_metrics(cover, weights=None, ground_truth_cover=None):
-    t0 = time.time()
-
-    fomd_results = fomd(cover, weights)
-    expansion_results = expansion(cover, weights)
-    cut_ratio_results = cut_ratio(cover)
-    conductance_results = conductance(cover, weights)
-    n_cut_results = normalized_cut(cover, weights)
-
-    # Get out degree fraction results then reuse for max, average, flake
-    odf = out_degree_fraction(cover, weights)
-    odf = odf.tocsc()
-    max_out_results = maximum_out_degree_fraction(cover, odf=odf, weights=weights)
-    avg_out_results = average_out_degree_fraction(cover, odf=odf, weights=weights)
-    flake_odf_results = flake_out_degree_fraction(cover, odf=odf, weights=weights)
-    sep_results = separability(cover,weights)
-    results_key = "results"
-    agg_key = "aggregations"
-
-
-    cover.metrics = {
-            'Fraction over a Median Degree' : {results_key:fomd_results, agg_key:aggregate(fomd_results)},
-            'Expansion'                     : {results_key:expansion_results, agg_key:aggregate(expansion_results)},
-            'Cut Ratio'                     : {results_key:cut_ratio_results, agg_key:aggregate(cut_ratio_results)},
-            'Conductance'                   : {results_key:conductance_results, agg_key:aggregate(conductance_results)},
-            'Normalized Cut'                : {results_key:n_cut_results, agg_key:aggregate(n_cut_results)},
-            'Maximum Out Degree Fraction'   : {results_key:max_out_results, agg_key:aggregate(max_out_results)},
-            'Average Out Degree Fraction'   : {results_key:avg_out_results, agg_key:aggregate(avg_out_results)},
-            'Flake Out Degree Fraction'     : {results_key:flake_odf_results, agg_key:aggregate(flake_odf_results)},
-            'Separability'                  : {results_key:sep_results, agg_key:aggregate(sep_results)},
+    #membership and crossing are rebuilt by igraph on every access, so they are computed once, along with the
+    #community incidence matrix, and shared by all the metrics below through the cover until we are done
+    cover._metric_cache = {
+            'membership_sets' : [frozenset(vertex_communities) for vertex_communities in cover.membership],
+            'crossing'        : cover.crossing(),
+            'incidence'       : __incidence_matrix(cover)
             }
+    try:
+        t0 = time.time()
+
+        # External edges are shared by all the boundary metrics, internal strengths by fomd and the internal edge
+        # counts of conductance, normalized cut and separability
+        ext_edges = external_edges(cover)
+        #resolve the weights to an edge weight array once, every metric accepts it in place of an attribute name
+        weights = __get_weights(cover.graph, weights)
+        int_strengths = __internal_strengths(cover, weights)
+        int_edges_sums = __internal_edge_sums(int_strengths)
+
+        fomd_results = fomd(cover, weights, int_strengths=int_strengths)
+        expansion_results = expansion(cover, weights, ext_edges=ext_edges)
+        cut_ratio_results = cut_ratio(cover, ext_edges=ext_edges)
+        conductance_results = conductance(cover, weights, int_edges_sums=int_edges_sums, ext_edges=ext_edges)
+        n_cut_results = normalized_cut(cover, weights, int_edges_sums=int_edges_sums, ext_edges=ext_edges)
+
+        # Get out degree fraction results then reuse for max, average, flake
+        odf = out_degree_fraction(cover, weights, ext_edges=ext_edges)
+        odf = odf.tocsc()
+        sizes = __community_sizes(cover)
+        max_out_results, avg_out_results, flake_odf_results = __odf_reductions(odf, sizes)
+        sep_results = separability(cover,weights, int_edges_sums=int_edges_sums, ext_edges=ext_edges)
+        results_key = "results"
+        agg_key = "aggregations"
+
+
+        cover.metrics = {
+                'Fraction over a Median Degree' : {results_key:fomd_results, agg_key:aggregate(fomd_results)},
+                'Expansion'                     : {results_key:expansion_results, agg_key:aggregate(expansion_results)},
+                'Cut Ratio'                     : {results_key:cut_ratio_results, agg_key:aggregate(cut_ratio_results)},
+                'Conductance'                   : {results_key:conductance_results, agg_key:aggregate(conductance_results)},
+                'Normalized Cut'                : {results_key:n_cut_results, agg_key:aggregate(n_cut_results)},
+                'Maximum Out Degree Fraction'   : {results_key:max_out_results, agg_key:aggregate(max_out_results)},
+                'Average Out Degree Fraction'   : {results_key:avg_out_results, agg_key:aggregate(avg_out_results)},
+                'Flake Out Degree Fraction'     : {results_key:flake_odf_results, agg_key:aggregate(flake_odf_results)},
+                'Separability'                  : {results_key:sep_results, agg_key:aggregate(sep_results)},
+                }
+
+        for i in range(len(cover)):
+            sg = cover.subgraph(i)
+            sg.compute_metrics(refresh=False)
+            #we want to add the metrics from the subgraph calculations to the current cover. The cover and
+            #subgraph are essentially the same thing, however because we use the igraph graph functions we
+            #can't natively call these call a cover...  hence the need to transfer over the results
+            for key, val in sg.metrics.items():
+                if key not in cover.metrics:
+                    cover.metrics[key] = {results_key:[], agg_key:None}
+                cover.metrics[key][results_key] += [val]
+        #aggregate just the results from the subgraph metrics
+        for k  in sg.metrics.keys():
+            cover.metrics[k][agg_key] = aggregate(cover.metrics[k][results_key])
+
+        #omega compares the whole cover rather than each community, so it is kept apart from the metrics
+        cover.omega = compare_omega(cover, ground_truth_cover)
+    finally:
+        cover._metric_cache = None
 
-    for i in range(len(cover)):
-        sg = cover.subgraph(i)
-        sg.compute_metrics(refresh=False)
-        #we want to add the metrics from the subgraph calculations to the current cover. The cover and
-        #subgraph are essentially the same thing, however because we use the igraph graph functions we
-        #can't natively call these call a cover...  hence the need to transfer over the results
-        for key, val in sg.metrics.items():
-            if key not in cover.metrics:
-                cover.metrics[key] = {results_key:[], agg_key:None}
-            cover.metrics[key][results_key] += [val]
-    #aggregate just the results from the subgraph metrics
-    for k  in sg.metrics.keys():
-        cover.metrics[k][agg_key] = aggregate(cover.metrics[k][results_key])
 
 def print_metrics(cover):
 
@@ -334,6 +485,8 @@ def print_metrics(cover):
 Cover.fraction_over_median_degree = fomd
 VertexCover.metrics = None
 VertexCover.metrics_stats = None
+VertexCover.omega = None
+VertexCover._metric_cache = None
 VertexCover.print_metrics = print_metrics
 VertexCover.compare_omega = compare_omega
 VertexCover.compute_metrics = compute_metrics
@@ -1,3 +1,4 @@
+import functools
 import numpy as np
 import scipy
 import scipy.sparse as sp
@@ -84,9 +85,15 @@ def __get_omega_e(A1, A2, sparse):
     rv /= (2*M)**2
     return rv;
 
+@functools.lru_cache(maxsize=2)
+def __get_cached_matrix(cover_membership, sparse):
+    return __get_matrix(cover_membership, sparse)
+
 def omega_index(cover_membership_a, cover_membership_b, sparse=True):
     '''
     Uses the Omega Index metrics to compare two covers of a given domain, e.g. a Graph.
+    The matrix of cover_membership_b (the ground truth when called through compare_omega) is memoized,
+    so comparing many covers against the same ground truth only builds it once.
     @param cover_membership_a : A list of vertex to membership list.
             Example - a = [[0,1],[1],[0,2]]
     @param cover_membership_b : A list of vertex to membership list.
@@ -94,9 +101,8 @@ def omega_index(cover_membership_a, cover_membership_b, sparse=True):
     '''
 
     A1 = __get_matrix(cover_membership_a, sparse)
-    A2 = __get_matrix(cover_membership_b, sparse)
+    A2 = __get_cached_matrix(tuple(map(tuple, cover_membership_b)), sparse)
     omega_u = __get_omega_u(A1, A2, sparse)
     omega_e = __get_omega_e(A1, A2, sparse)
 
     return (omega_u - omega_e)/(1-omega_e)
-
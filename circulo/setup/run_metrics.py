@@ -141,7 +141,7 @@ def analyze_json(worker):
         "name" : data['job_name'],
         "elapsed" :data['elapsed'],
         "membership" : data['membership'],
-        "omega": results_cover.compare_omega(ground_truth_cover),
+        "omega": results_cover.omega,
         "metrics": results_cover.metrics,
         "metrics_elapsed": (time.time() - t0)
         }
@@ -1,13 +1,16 @@
 import random
 import unittest
 import numpy as np
+import scipy.sparse
 import circulo.metrics
 import igraph
 
 import importlib
 import inspect
+from unittest import mock
 from circulo.data.databot import CirculoData
 from circulo.setup.run_metrics import cover_from_membership
+from circulo.metrics.omega import omega_index
 import circulo.metrics.cover
 
 
@@ -189,6 +192,76 @@ class TestMetrics(unittest.TestCase):
 
         self.assertListAlmostEquals(truth, test, 2)
 
+    def test_listweights(self):
+        #weights given as a list must match the same weights given as an edge attribute, without leaving attributes behind
+        cover = circulo.metrics.cover
+        for metric in [cover.fomd, cover.expansion, cover.conductance, cover.normalized_cut, cover.separability,
+                       cover.maximum_out_degree_fraction, cover.average_out_degree_fraction, cover.flake_out_degree_fraction]:
+            truth = metric(self.cover, weights='weight')
+            test = metric(self.cover, weights=self.weights)
+            self.assertListAlmostEquals(truth, test, 6)
+
+        self.assertEqual(['weight'], self.G.es.attributes())
+
+    def test_count_above(self):
+        #the numba kernel (when installed) and the NumPy fallback must both match a dense count
+        count_above = getattr(circulo.metrics.cover, '__count_above')
+        odf = circulo.metrics.cover.out_degree_fraction(self.cover, weights='weight')
+
+        for threshold in [0, 0.05, 0.1, 0.2]:
+            truth = (odf.toarray() > threshold).sum(axis=0)
+            self.assertEqual(truth.tolist(), count_above(odf, threshold).tolist())
+            with mock.patch.object(circulo.metrics.cover, 'njit', None):
+                self.assertEqual(truth.tolist(), count_above(odf, threshold).tolist())
+
+    def test_odfreductions(self):
+        #the fused reductions used by compute_metrics must agree with the public ODF functions, with and without numba.
+        #Vertex 16 is moved to its own community, which then has a flake ODF of 1
+        cover = circulo.metrics.cover
+        odf_reductions = getattr(cover, '__odf_reductions')
+        membership = [[v for v in c if v != 16] for c in self.cover] + [[16]]
+        vc = cover.VertexCover(self.G, membership)
+        sizes = np.array([len(c) for c in vc], dtype=float)
+
+        for weights in [None, 'weight']:
+            odf = cover.out_degree_fraction(vc, weights=weights)
+            truth = (cover.maximum_out_degree_fraction(vc, odf=odf),
+                     cover.average_out_degree_fraction(vc, odf=odf, sizes=sizes),
+                     cover.flake_out_degree_fraction(vc, odf=odf, sizes=sizes))
+            self.assertEqual(1, truth[2][-1])
+            for njit in [cover.njit, None]:
+                with mock.patch.object(cover, 'njit', njit):
+                    for a, b in zip(truth, odf_reductions(odf, sizes)):
+                        self.assertListAlmostEquals(a, b, 6)
+
+        #a fully stored column has no implicit zero to take the maximum over
+        dense = np.array([[-0.5, -0.5, 0.75], [-0.25, 0, 0.5], [-0.75, 0, 0.25]])
+        odf = scipy.sparse.csc_matrix(dense)
+        sizes = np.array([3, 3, 2], dtype=float)
+        for njit in [cover.njit, None]:
+            with mock.patch.object(cover, 'njit', njit):
+                maxs, avgs, flakes = odf_reductions(odf, sizes)
+                self.assertListAlmostEquals(dense.max(axis=0), maxs, 6)
+                self.assertListAlmostEquals(dense.sum(axis=0)/sizes, avgs, 6)
+                self.assertListAlmostEquals((dense > 0.5).sum(axis=0)/sizes, flakes, 6)
+
+    def test_computemetrics_omega(self):
+        #omega against the ground truth is kept on the cover, not in the per-community metrics,
+        #and the per-call metric cache is cleared once compute_metrics returns
+        gt = circulo.metrics.cover.VertexCover(self.G, [[0,1,2,3,4,5,6,7,10,11,12,13,16,17,19,20,21],
+                                                        [8,9,14,15,18,22,23,24,25,26,27,28,29,30,31,32,33]])
+
+        self.cover.compute_metrics(weights='weight', ground_truth_cover=gt)
+        self.assertAlmostEqual(omega_index(self.cover.membership, gt.membership), self.cover.omega)
+        self.assertFalse([k for k in self.cover.metrics if 'omega' in k.lower()])
+        self.assertIsNone(self.cover._metric_cache)
+
+        cover = circulo.metrics.cover.VertexCover(self.G, self.cover)
+        cover.compute_metrics(weights='weight')
+        self.assertIsNone(cover.omega)
+        self.assertFalse([k for k in cover.metrics if 'omega' in k.lower()])
+        self.assertIsNone(cover._metric_cache)
+
     def assertListAlmostEquals(self, a, b, places=None, msg=None):
         self.assertEquals(np.round(a,places).tolist(),
                           np.round(b,places).tolist(), msg=msg)